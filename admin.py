@@ -1,5 +1,5 @@
 from functools import wraps
-from flask import Blueprint, jsonify
+from flask import Blueprint, jsonify, request
 from flask_login import current_user, login_required
 
 admin = Blueprint('admin', __name__)
@@ -26,3 +26,13 @@ def get_all_users():
     from models import User
     users = User.query.all()
     return jsonify([user.to_dict() for user in users])
+
+@admin.route('/api/admin/usage', methods=['GET'])
+@admin_required
+def get_usage():
+    from utils.usage import aggregate_usage
+    group_by = request.args.get('group_by', 'user').lower()
+    try:
+        return jsonify(aggregate_usage(group_by))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
@@ -1,3 +1,4 @@
+import click
 from flask import Flask
 from flask_cors import CORS
 from datetime import timedelta
@@ -12,6 +13,34 @@ def configure_logging():
     )
     return logging.getLogger(__name__)
 
+def add_missing_columns():
+    """Add nullable model columns that db.create_all() won't add to existing tables"""
+    from sqlalchemy import inspect, text
+    inspector = inspect(db.engine)
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing or not column.nullable:
+                continue
+            column_type = column.type.compile(dialect=db.engine.dialect)
+            with db.engine.begin() as conn:
+                conn.execute(text(f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {column_type}'))
+            logger.info(f"Added column {table.name}.{column.name}")
+
+def parse_interval_hours(value):
+    """Parse RETENTION_INTERVAL_HOURS, None when unset; must be a positive number"""
+    if not value:
+        return None
+    try:
+        hours = float(value)
+    except ValueError:
+        raise ValueError(f"RETENTION_INTERVAL_HOURS must be a number of hours, got {value!r}")
+    if hours <= 0:
+        raise ValueError(f"RETENTION_INTERVAL_HOURS must be positive, got {value!r}")
+    return hours
+
 def create_app():
     # Initialize Flask app
     app = Flask(__name__, 
@@ -30,7 +59,12 @@ def create_app():
             "pool_pre_ping": True,
         },
         JWT_SECRET_KEY=os.environ.get("JWT_SECRET_KEY", "hitchens_secret_key"),
-        JWT_ACCESS_TOKEN_EXPIRES=timedelta(days=1)
+        JWT_ACCESS_TOKEN_EXPIRES=timedelta(days=1),
+        # Relative paths resolve against the app, not the working directory
+        ARCHIVE_DIR=os.path.join(app.root_path, os.environ.get("ARCHIVE_DIR", "archive")),
+        RETENTION_DAYS=int(os.environ.get("RETENTION_DAYS", 365)),
+        RETENTION_INTERVAL_HOURS=parse_interval_hours(os.environ.get("RETENTION_INTERVAL_HOURS")),
+        MAX_INPUT_TOKENS=int(os.environ["MAX_INPUT_TOKENS"]) if os.environ.get("MAX_INPUT_TOKENS") else None
     )
 
     # Initialize extensions with app
@@ -60,16 +94,34 @@ def create_app():
         # Create all tables
         try:
             db.create_all()
+            add_missing_columns()
             logger.info("Database tables created successfully")
         except Exception as e:
             logger.error(f"Error creating database tables: {str(e)}")
             raise
 
+        from utils.retention import archive_transformations
+
+        @app.cli.command('archive-transformations')
+        @click.option('--days', type=int, default=None,
+                      help='Archive transformations older than this many days')
+        def archive_transformations_command(days):
+            """Move old transformations to compressed cold storage"""
+            retention_days = days if days is not None else app.config['RETENTION_DAYS']
+            count = archive_transformations(app.config['ARCHIVE_DIR'], retention_days)
+            click.echo(f"Archived {count} transformations older than {retention_days} days")
+
     return app
 
 if __name__ == "__main__":
     logger = configure_logging()
     app = create_app()
+
+    # debug=True starts Werkzeug's reloader, which runs this module in a parent
+    # watcher process and a serving child; only the child runs background jobs
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        from utils.retention import start_retention_scheduler
+        start_retention_scheduler(app)
     try:
         logger.info("Starting Flask application...")
         logger.info(f"Static folder: {app.static_folder}")
@@ -37,6 +37,14 @@ class Transformation(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     api_provider = db.Column(db.String(50), nullable=False, default='openai')
+    model_name = db.Column(db.String(100))
+    prompt_tokens = db.Column(db.Integer)
+    completion_tokens = db.Column(db.Integer)
+    latency_ms = db.Column(db.Integer)
+    time_to_first_token_ms = db.Column(db.Integer)
+    estimated_input_tokens = db.Column(db.Integer)
+    max_output_tokens = db.Column(db.Integer)
+    truncated = db.Column(db.Boolean)
     
     user = db.relationship('User', backref=db.backref('transformations', lazy=True))
 
@@ -48,7 +56,55 @@ class Transformation(db.Model):
             'verbosity_level': self.verbosity_level,
             'persona': self.persona,
             'api_provider': self.api_provider,
+            'model_name': self.model_name,
+            'prompt_tokens': self.prompt_tokens,
+            'completion_tokens': self.completion_tokens,
+            'latency_ms': self.latency_ms,
+            'time_to_first_token_ms': self.time_to_first_token_ms,
+            'estimated_input_tokens': self.estimated_input_tokens,
+            'max_output_tokens': self.max_output_tokens,
+            'truncated': self.truncated,
             'created_at': self.created_at.strftime('%Y-%m-%d %H:%M:%S'),
             'user_id': self.user_id,
             'username': self.user.username if self.user else None
         }
+
+class ArchivedTransformation(db.Model):
+    """Index entry for a transformation moved out to cold storage."""
+    __tablename__ = 'archived_transformation'
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    created_at = db.Column(db.DateTime, nullable=False, index=True)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+    partition = db.Column(db.String(255), nullable=False)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'user_id': self.user_id,
+            'created_at': self.created_at.strftime('%Y-%m-%d %H:%M:%S'),
+            'archived_at': self.archived_at.strftime('%Y-%m-%d %H:%M:%S'),
+            'partition': self.partition
+        }
+
+class UsageRollup(db.Model):
+    """Usage totals of archived transformations, kept after the rows leave the hot table."""
+    __tablename__ = 'usage_rollup'
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    persona = db.Column(db.String(50), nullable=False)
+    api_provider = db.Column(db.String(50), nullable=False)
+    # '' rather than NULL for unknown models so the unique constraint applies
+    model_name = db.Column(db.String(100), nullable=False, default='')
+    verbosity_level = db.Column(db.Integer, nullable=False)
+    transformations = db.Column(db.Integer, nullable=False, default=0)
+    prompt_tokens = db.Column(db.BigInteger, nullable=False, default=0)
+    completion_tokens = db.Column(db.BigInteger, nullable=False, default=0)
+    latency_ms_total = db.Column(db.BigInteger, nullable=False, default=0)
+    latency_samples = db.Column(db.Integer, nullable=False, default=0)
+    time_to_first_token_ms_total = db.Column(db.BigInteger, nullable=False, default=0)
+    time_to_first_token_samples = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'persona', 'api_provider', 'model_name', 'verbosity_level'),
+    )
@@ -3,11 +3,15 @@ import logging
 from flask import Blueprint, request, jsonify, send_from_directory
 from flask_login import login_required, current_user
 from functools import wraps
+from datetime import datetime
 from extensions import db
 # Import models after db is initialized
-from models import User, Transformation
-from utils.openai_helper import transform_text as openai_transform
+from models import User, Transformation, ArchivedTransformation
+from utils.openai_helper import transform_text as openai_transform, PERSONA_PROMPTS
 from utils.gemini_helper import transform_text as gemini_transform
+from utils.retention import load_archived
+from utils.usage import aggregate_usage
+from utils.token_budget import plan_budget
 
 # Configure logging
 logging.basicConfig(
@@ -21,6 +25,10 @@ main = Blueprint('main', __name__, static_folder='static/react', static_url_path
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Archived history entries returned per request
+ARCHIVE_PAGE_SIZE = 50
+MAX_ARCHIVE_PAGE_SIZE = 200
+
 # Configure transform functions with error handling
 TRANSFORM_FUNCTIONS = {}
 
@@ -128,11 +136,30 @@ def transform():
                 'error': f'Invalid API provider: {api_provider}',
                 'available_providers': available_providers
             }), 400
+
+        # Size the output budget and reject inputs that can't fit
+        from flask import current_app
+        budget = plan_budget(
+            input_text,
+            PERSONA_PROMPTS.get(persona, ''),
+            persona,
+            verbosity_level,
+            api_provider,
+            current_app.config['MAX_INPUT_TOKENS']
+        )
+        if not budget['fits']:
+            return jsonify({
+                'error': f"Input is too long: about {budget['input_tokens']} tokens, "
+                         f"limit is {budget['max_input_tokens']}",
+                'budget': budget
+            }), 413
             
         # Perform transformation
         try:
             transform_func = TRANSFORM_FUNCTIONS[api_provider]
-            transformed_text = transform_func(input_text, persona, verbosity_level)
+            transformed_text, usage = transform_func(
+                input_text, persona, verbosity_level, max_tokens=budget['max_output_tokens']
+            )
             
             if not transformed_text:
                 raise ValueError("Transformation returned empty result")
@@ -144,15 +171,32 @@ def transform():
                 verbosity_level=verbosity_level,
                 persona=persona,
                 api_provider=api_provider,
-                user_id=current_user.id
+                user_id=current_user.id,
+                model_name=usage.get('model'),
+                prompt_tokens=usage.get('prompt_tokens'),
+                completion_tokens=usage.get('completion_tokens'),
+                latency_ms=usage.get('latency_ms'),
+                time_to_first_token_ms=usage.get('time_to_first_token_ms'),
+                estimated_input_tokens=budget['input_tokens'],
+                max_output_tokens=budget['max_output_tokens'],
+                truncated=usage.get('truncated')
             )
             db.session.add(transformation)
             db.session.commit()
+
+            if usage.get('truncated'):
+                logger.warning(
+                    f"Transformation {transformation.id} truncated at {budget['max_output_tokens']} tokens "
+                    f"({api_provider}/{persona}/v{verbosity_level}, budget from {budget['source']})"
+                )
             
             return jsonify({
                 'transformed_text': transformed_text,
                 'id': transformation.id,
                 'api_provider': api_provider,
+                'usage': usage,
+                'budget': budget,
+                'truncated': bool(usage.get('truncated')),
                 'status': 'success'
             })
             
@@ -195,6 +239,41 @@ def history():
         ).order_by(
             Transformation.created_at.desc()
         ).all()
-        return jsonify([t.to_dict() for t in transformations])
+        results = [t.to_dict() for t in transformations]
+
+        # Archived entries live in cold storage and are only read on request
+        if request.args.get('include_archived', '').lower() in ('1', 'true', 'yes'):
+            from flask import current_app
+            try:
+                limit = min(int(request.args.get('limit', ARCHIVE_PAGE_SIZE)), MAX_ARCHIVE_PAGE_SIZE)
+                before = request.args.get('before')
+                before = datetime.strptime(before, '%Y-%m-%d %H:%M:%S') if before else None
+            except ValueError:
+                return jsonify({'error': "Invalid limit or before (expected 'YYYY-MM-DD HH:MM:SS')"}), 400
+            if limit < 1:
+                return jsonify({'error': 'Invalid limit'}), 400
+
+            # Page through the index so only the needed partition files are read
+            query = ArchivedTransformation.query.filter_by(user_id=current_user.id)
+            if before:
+                query = query.filter(ArchivedTransformation.created_at < before)
+            entries = query.order_by(
+                ArchivedTransformation.created_at.desc()
+            ).limit(limit).all()
+            results.extend(load_archived(current_app.config['ARCHIVE_DIR'], entries))
+
+        return jsonify(results)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@main.route('/api/usage')
+@login_required
+def get_usage():
+    """Token usage and latency of the current user's transformations"""
+    group_by = request.args.get('group_by', 'persona').lower()
+    try:
+        return jsonify(aggregate_usage(group_by, user_id=current_user.id))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -1,6 +1,12 @@
 import os
+import time
+import logging
 import google.generativeai as genai
 
+logger = logging.getLogger(__name__)
+
+MODEL = 'models/gemini-1.5-pro-002'
+
 # Copy PERSONA_PROMPTS from openai_helper.py
 PERSONA_PROMPTS = {
     "hitchens": """You are Christopher Hitchens, the renowned intellectual, journalist, and literary critic. 
@@ -67,7 +73,7 @@ PERSONA_PROMPTS = {
        - Keep the tone neutral and professional"""
 }
 
-def transform_text(text, persona="hitchens", verbosity_level=1):
+def transform_text(text, persona="hitchens", verbosity_level=1, max_tokens=None):
     """
     Transform input text using Gemini API with enhanced context and persona-based styling.
 
@@ -75,9 +81,12 @@ def transform_text(text, persona="hitchens", verbosity_level=1):
         text (str): Input text to transform
         persona (str): Selected persona ('hitchens', 'trump', or 'friedman')
         verbosity_level (int): Level of detail (1-3)
+        max_tokens (int): Cap on generated tokens, or None for the model default
 
     Returns:
-        str: Transformed text in the selected persona's style
+        tuple: (transformed text in the selected persona's style, usage dict
+            with model, prompt_tokens, completion_tokens, latency_ms,
+            time_to_first_token_ms, finish_reason and truncated)
     """
     verbosity_map = {
         1: "brief yet intellectually engaging response",
@@ -91,7 +100,7 @@ def transform_text(text, persona="hitchens", verbosity_level=1):
 
         # Initialize Gemini API
         genai.configure(api_key=os.environ.get("GEMINI_API_KEY"))
-        model = genai.GenerativeModel('models/gemini-1.5-pro-002')
+        model = genai.GenerativeModel(MODEL)
 
         # Create the system prompt with the selected persona
         system_prompt = PERSONA_PROMPTS[persona]
@@ -120,18 +129,39 @@ def transform_text(text, persona="hitchens", verbosity_level=1):
 
         # Generate the response with search retrieval
         full_prompt = f"{system_prompt}\n\n{prompt}"
+        started = time.perf_counter()
         response = model.generate_content(
             contents=full_prompt,
-            tools={"google_search_retrieval": {}}
+            tools={"google_search_retrieval": {}},
+            generation_config={"max_output_tokens": max_tokens} if max_tokens else None
         )
+        latency_ms = int((time.perf_counter() - started) * 1000)
+
+        usage_metadata = getattr(response, 'usage_metadata', None)
+        finish_reason = response.candidates[0].finish_reason.name if response.candidates else None
+        usage = {
+            'model': MODEL,
+            'prompt_tokens': getattr(usage_metadata, 'prompt_token_count', None),
+            'completion_tokens': getattr(usage_metadata, 'candidates_token_count', None),
+            'latency_ms': latency_ms,
+            'time_to_first_token_ms': None,
+            'finish_reason': finish_reason,
+            # The reply hit max_output_tokens and was cut off
+            'truncated': finish_reason == 'MAX_TOKENS'
+        }
 
         # Log the response
         print("\n=== Gemini API Response ===")
         print("Response:")
         print(f"{response.text[:200]}...")  # Show first 200 chars
         print("=====================\n")
+        logger.info(
+            f"Gemini {persona}/v{verbosity_level} (max {max_tokens} tokens): {latency_ms}ms, "
+            f"tokens {usage['prompt_tokens']} in / {usage['completion_tokens']} out, "
+            f"finish reason {finish_reason}"
+        )
 
-        return response.text
+        return response.text, usage
 
     except Exception as e:
         raise Exception(f"Failed to transform text: {str(e)}")
\ No newline at end of file
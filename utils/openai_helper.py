@@ -1,4 +1,5 @@
 import os
+import time
 from openai import OpenAI
 
 # the newest OpenAI model is "gpt-4o-2024-11-20" which was released May 13, 2024.
@@ -72,7 +73,17 @@ PERSONA_PROMPTS = {
        - Keep the tone neutral and professional"""
 }
 
-def transform_text(text, persona="hitchens", verbosity_level=1):
+def transform_text(text, persona="hitchens", verbosity_level=1, max_tokens=5000):
+    """
+    Transform input text using the OpenAI API.
+
+    max_tokens caps the length of the generated response.
+
+    Returns:
+        tuple: (transformed text, usage dict with model, prompt_tokens,
+            completion_tokens, latency_ms, time_to_first_token_ms,
+            finish_reason and truncated)
+    """
     verbosity_map = {
         1: "brief yet intellectually engaging response",
         2: "moderately detailed response with proper depth",
@@ -88,16 +99,30 @@ def transform_text(text, persona="hitchens", verbosity_level=1):
         prompt = f"""Respond to this text with a {verbosity_map[verbosity_level]} 
         that exemplifies your characteristic style of communication and analytical approach:\n\n{text}"""
         
+        started = time.perf_counter()
         response = client.chat.completions.create(
             model=MODEL,
             messages=[
                 {"role": "system", "content": system_prompt},
                 {"role": "user", "content": prompt}
             ],
-            max_tokens=5000,
+            max_tokens=max_tokens,
             temperature=0.85
         )
+        latency_ms = int((time.perf_counter() - started) * 1000)
+        finish_reason = response.choices[0].finish_reason
+
+        usage = {
+            'model': response.model or MODEL,
+            'prompt_tokens': response.usage.prompt_tokens if response.usage else None,
+            'completion_tokens': response.usage.completion_tokens if response.usage else None,
+            'latency_ms': latency_ms,
+            'time_to_first_token_ms': None,
+            'finish_reason': finish_reason,
+            # The reply hit max_tokens and was cut off
+            'truncated': finish_reason == 'length'
+        }
         
-        return response.choices[0].message.content
+        return response.choices[0].message.content, usage
     except Exception as e:
         raise Exception(f"Failed to respond to text: {str(e)}")
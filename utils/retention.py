@@ -0,0 +1,190 @@
+import os
+import gzip
+import json
+import uuid
+import logging
+import threading
+from datetime import datetime, timedelta
+from sqlalchemy import text
+from extensions import db
+from models import Transformation, ArchivedTransformation
+from utils.usage import roll_up
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+
+# Postgres advisory lock key held while a batch is being archived
+ARCHIVE_LOCK_KEY = 7260260
+
+# Serialises runs within one process when the database has no advisory locks
+_local_lock = threading.Lock()
+
+def partition_name(created_at, batch_id):
+    """Member file for one archived batch, grouped in a directory per month"""
+    return os.path.join(created_at.strftime('%Y-%m'), f'{batch_id}.ndjson.gz')
+
+def _try_lock_batch():
+    """Take the archive lock for the current transaction, False if another run holds it"""
+    if db.engine.dialect.name != 'postgresql':
+        return True
+    return db.session.execute(
+        text('SELECT pg_try_advisory_xact_lock(:key)'), {'key': ARCHIVE_LOCK_KEY}
+    ).scalar()
+
+def _write_member(path, rows):
+    """Write rows to a new gzip file and make it durable before returning"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as raw:
+        with gzip.open(raw, 'wt', encoding='utf-8') as f:
+            for t in rows:
+                f.write(json.dumps(t.to_dict()) + '\n')
+        raw.flush()
+        os.fsync(raw.fileno())
+    os.replace(tmp_path, path)
+
+    # Persist the rename itself
+    dir_fd = os.open(os.path.dirname(path), os.O_RDONLY)
+    try:
+        os.fsync(dir_fd)
+    finally:
+        os.close(dir_fd)
+
+def archive_transformations(archive_dir, retention_days, batch_size=BATCH_SIZE):
+    """
+    Move transformations older than the retention window into compressed
+    NDJSON files, one per batch and month, and record them in the archive
+    index. Rows are only deleted once their file is safely on disk.
+
+    Args:
+        archive_dir (str): Directory holding the partition files
+        retention_days (int): Rows older than this many days are archived
+        batch_size (int): Rows moved per database transaction
+
+    Returns:
+        int: Number of transformations archived
+    """
+    if not _local_lock.acquire(blocking=False):
+        logger.info("Retention run already in progress, skipping")
+        return 0
+
+    try:
+        cutoff = datetime.utcnow() - timedelta(days=retention_days)
+        os.makedirs(archive_dir, exist_ok=True)
+        archived = 0
+
+        while True:
+            try:
+                if not _try_lock_batch():
+                    db.session.rollback()
+                    logger.info("Another retention run holds the archive lock, stopping")
+                    break
+
+                batch = Transformation.query.filter(
+                    Transformation.created_at < cutoff
+                ).order_by(
+                    Transformation.id
+                ).limit(batch_size).all()
+                if not batch:
+                    db.session.rollback()
+                    break
+
+                batch_id = f"{datetime.utcnow().strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+                partitions = {}
+                for t in batch:
+                    partitions.setdefault(partition_name(t.created_at, batch_id), []).append(t)
+
+                # Keep usage totals for quotas once the rows are gone
+                roll_up(batch)
+                for partition, rows in partitions.items():
+                    _write_member(os.path.join(archive_dir, partition), rows)
+                    for t in rows:
+                        db.session.add(ArchivedTransformation(
+                            id=t.id,
+                            user_id=t.user_id,
+                            created_at=t.created_at,
+                            partition=partition
+                        ))
+                        db.session.delete(t)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+
+            archived += len(batch)
+            logger.info(f"Archived {len(batch)} transformations into {len(partitions)} partition(s)")
+
+        return archived
+    finally:
+        _local_lock.release()
+
+def load_archived(archive_dir, entries):
+    """
+    Fetch archived transformations from their partition files.
+
+    Args:
+        archive_dir (str): Directory holding the partition files
+        entries (list): ArchivedTransformation index rows to load
+
+    Returns:
+        list: Transformation dicts, in the order of the given entries
+    """
+    wanted = {}
+    for entry in entries:
+        wanted.setdefault(entry.partition, set()).add(entry.id)
+
+    found = {}
+    for partition, ids in wanted.items():
+        path = os.path.join(archive_dir, partition)
+        if not os.path.exists(path):
+            logger.error(f"Archive partition missing: {path}")
+            continue
+        try:
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                for line in f:
+                    record = json.loads(line)
+                    if record['id'] in ids:
+                        record['archived'] = True
+                        found[record['id']] = record
+        except (OSError, EOFError, ValueError) as e:
+            logger.error(f"Archive partition unreadable: {path}: {str(e)}")
+            continue
+
+    return [found[entry.id] for entry in entries if entry.id in found]
+
+def start_retention_scheduler(app):
+    """
+    Run archive_transformations at startup and then periodically in a
+    daemon thread. Only call this from the process that serves requests.
+    """
+    interval_hours = app.config.get('RETENTION_INTERVAL_HOURS')
+    if not interval_hours:
+        return
+
+    # A directory inside the app lives on the instance's own (often ephemeral) disk
+    archive_dir = os.path.abspath(app.config['ARCHIVE_DIR'])
+    app_dir = os.path.abspath(app.root_path)
+    if os.path.commonpath([archive_dir, app_dir]) == app_dir:
+        logger.error(
+            f"Not scheduling retention: ARCHIVE_DIR ({archive_dir}) must be outside the app "
+            "directory, on persistent storage shared by every instance"
+        )
+        return
+
+    def run():
+        with app.app_context():
+            try:
+                count = archive_transformations(archive_dir, app.config['RETENTION_DAYS'])
+                logger.info(f"Scheduled retention run archived {count} transformations")
+            except Exception as e:
+                logger.error(f"Scheduled retention run failed: {str(e)}")
+        schedule(interval_hours * 3600)
+
+    def schedule(delay):
+        timer = threading.Timer(delay, run)
+        timer.daemon = True
+        timer.start()
+
+    schedule(0)
+    logger.info(f"Retention job scheduled at startup and every {interval_hours} hour(s)")
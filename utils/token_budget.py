@@ -0,0 +1,169 @@
+import math
+import logging
+from models import Transformation
+
+logger = logging.getLogger(__name__)
+
+# Context window of the model behind each provider, in tokens
+CONTEXT_WINDOWS = {
+    'openai': 128000,
+    'gemini': 2097152
+}
+
+# Default output budget per verbosity level before any history is available;
+# generous, since a reply cut off at the cap is worse than a loose cap
+VERBOSITY_BUDGETS = {
+    1: 800,
+    2: 1500,
+    3: 3000
+}
+
+MIN_OUTPUT_TOKENS = 200
+MAX_OUTPUT_TOKENS = 5000
+
+# Instructions wrapped around the input text by the helpers
+PROMPT_OVERHEAD_TOKENS = 150
+
+HISTORY_SAMPLE_SIZE = 200
+MIN_HISTORY_SAMPLES = 20
+HISTORY_HEADROOM = 1.25
+
+# Above this share of truncated replies, grow the budget instead of
+# learning it from history that the old cap has cut short
+MAX_TRUNCATED_SHARE = 0.05
+TRUNCATION_GROWTH = 1.5
+
+# Characters above Latin Extended-B (CJK, Cyrillic, Arabic, emoji, ...)
+# tokenize at roughly one token each rather than ~4 characters per token
+LATIN_MAX_CODEPOINT = 0x024F
+
+def estimate_tokens(text):
+    """
+    Estimate the token count of text without calling a tokenizer.
+
+    Latin-script text uses the larger of ~4 characters per token and
+    ~0.75 words per token; every other character counts as one token.
+    This tracks GPT and Gemini tokenizers closely enough for budgeting.
+    """
+    if not text:
+        return 0
+    non_latin = sum(1 for c in text if ord(c) > LATIN_MAX_CODEPOINT)
+    latin = ''.join(c for c in text if ord(c) <= LATIN_MAX_CODEPOINT) if non_latin else text
+    by_chars = math.ceil(len(latin.strip()) / 4)
+    by_words = math.ceil(len(latin.split()) * 4 / 3)
+    return non_latin + max(by_chars, by_words)
+
+def _percentile_95(values):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * 0.95))]
+
+def _learn_from_history(samples):
+    """
+    Learn an output size from (value, truncated) samples.
+
+    Truncated replies stopped at the old cap, so they only show the cap was
+    too tight. They are left out of the percentile, and when they are common
+    the budget grows past the largest of them instead.
+
+    Returns:
+        tuple: (learned value, share of truncated samples), or (None, None)
+            if there is too little history
+    """
+    if len(samples) < MIN_HISTORY_SAMPLES:
+        return None, None
+
+    complete = [value for value, truncated in samples if not truncated]
+    truncated_share = round(1 - len(complete) / len(samples), 3)
+    if truncated_share > MAX_TRUNCATED_SHARE:
+        return max(value for value, _ in samples) * TRUNCATION_GROWTH, truncated_share
+    return _percentile_95(complete), truncated_share
+
+def _recent_transformations(persona, verbosity_level, api_provider, *columns):
+    return Transformation.query.with_entities(
+        Transformation.completion_tokens, Transformation.truncated, *columns
+    ).filter(
+        Transformation.persona == persona,
+        Transformation.verbosity_level == verbosity_level,
+        Transformation.api_provider == api_provider,
+        Transformation.completion_tokens.isnot(None),
+        *[column.isnot(None) for column in columns]
+    ).order_by(
+        Transformation.id.desc()
+    ).limit(HISTORY_SAMPLE_SIZE).all()
+
+def historical_output_tokens(persona, verbosity_level, api_provider):
+    """
+    Output size learned from recent completion token counts for this
+    persona, verbosity level and provider; see _learn_from_history.
+    """
+    rows = _recent_transformations(persona, verbosity_level, api_provider)
+    return _learn_from_history([(completion, truncated) for completion, truncated in rows])
+
+def historical_output_ratio(persona, verbosity_level, api_provider):
+    """
+    Output/input token ratio learned from recent transformations, for
+    personas whose output length follows the input; see _learn_from_history.
+    """
+    rows = _recent_transformations(
+        persona, verbosity_level, api_provider, Transformation.estimated_input_tokens
+    )
+    return _learn_from_history([
+        (completion / estimated, truncated)
+        for completion, truncated, estimated in rows if estimated > 0
+    ])
+
+def plan_budget(text, system_prompt, persona, verbosity_level, api_provider, max_input_tokens):
+    """
+    Pick the output token limit for a request and check the input fits.
+
+    Args:
+        text (str): Input text to transform
+        system_prompt (str): Persona system prompt sent with the text
+        persona (str): Selected persona
+        verbosity_level (int): Level of detail (1-3)
+        api_provider (str): Provider the request will be sent to
+        max_input_tokens (int): Largest input accepted regardless of provider,
+            or None to only enforce the provider's context window
+
+    Returns:
+        dict: Estimated input tokens, chosen max_output_tokens, the input
+            limit that applied, where the output budget came from, the
+            recent share of truncated replies, and whether the input fits
+    """
+    input_tokens = estimate_tokens(text)
+
+    # The personal persona rewrites the input, so its output scales with the
+    # input and history is kept as output/input ratios rather than raw counts
+    if persona == 'personal':
+        ratio, truncated_share = historical_output_ratio(persona, verbosity_level, api_provider)
+        if ratio is not None:
+            max_output_tokens = int(input_tokens * ratio * HISTORY_HEADROOM)
+            source = 'history'
+        else:
+            max_output_tokens = max(VERBOSITY_BUDGETS[verbosity_level], int(input_tokens * 1.5))
+            source = 'verbosity'
+    else:
+        historical, truncated_share = historical_output_tokens(persona, verbosity_level, api_provider)
+        if historical is not None:
+            max_output_tokens = int(historical * HISTORY_HEADROOM)
+            source = 'history'
+        else:
+            max_output_tokens = VERBOSITY_BUDGETS[verbosity_level]
+            source = 'verbosity'
+
+    max_output_tokens = max(MIN_OUTPUT_TOKENS, min(MAX_OUTPUT_TOKENS, max_output_tokens))
+
+    context_window = CONTEXT_WINDOWS.get(api_provider, min(CONTEXT_WINDOWS.values()))
+    context_limit = context_window - estimate_tokens(system_prompt) - PROMPT_OVERHEAD_TOKENS - max_output_tokens
+    input_limit = context_limit if max_input_tokens is None else min(max_input_tokens, context_limit)
+
+    budget = {
+        'input_tokens': input_tokens,
+        'max_input_tokens': input_limit,
+        'max_output_tokens': max_output_tokens,
+        'source': source,
+        'truncated_share': truncated_share,
+        'fits': input_tokens <= input_limit
+    }
+    logger.info(f"Token budget for {api_provider}/{persona}/v{verbosity_level}: {budget}")
+    return budget
@@ -0,0 +1,142 @@
+from sqlalchemy import func
+from extensions import db
+from models import User, Transformation, UsageRollup
+
+# Group name -> column name shared by Transformation and UsageRollup;
+# 'user' groups by User.username
+USAGE_GROUPS = {
+    'user': None,
+    'persona': 'persona',
+    'provider': 'api_provider',
+    'model': 'model_name',
+    'verbosity': 'verbosity_level'
+}
+
+# Groups a user may see for their own usage
+USER_USAGE_GROUPS = tuple(group for group in USAGE_GROUPS if group != 'user')
+
+def roll_up(transformations):
+    """
+    Add the usage of transformations to the rollup before they are archived.
+    The caller commits.
+    """
+    batch = {}
+    for t in transformations:
+        key = (t.user_id, t.persona, t.api_provider, t.model_name or '', t.verbosity_level)
+        totals = batch.setdefault(key, [0] * 7)
+        totals[0] += 1
+        totals[1] += t.prompt_tokens or 0
+        totals[2] += t.completion_tokens or 0
+        if t.latency_ms is not None:
+            totals[3] += t.latency_ms
+            totals[4] += 1
+        if t.time_to_first_token_ms is not None:
+            totals[5] += t.time_to_first_token_ms
+            totals[6] += 1
+
+    for (user_id, persona, api_provider, model_name, verbosity_level), totals in batch.items():
+        rollup = UsageRollup.query.filter_by(
+            user_id=user_id,
+            persona=persona,
+            api_provider=api_provider,
+            model_name=model_name,
+            verbosity_level=verbosity_level
+        ).first()
+        if rollup is None:
+            rollup = UsageRollup(
+                user_id=user_id,
+                persona=persona,
+                api_provider=api_provider,
+                model_name=model_name,
+                verbosity_level=verbosity_level,
+                transformations=0,
+                prompt_tokens=0,
+                completion_tokens=0,
+                latency_ms_total=0,
+                latency_samples=0,
+                time_to_first_token_ms_total=0,
+                time_to_first_token_samples=0
+            )
+            db.session.add(rollup)
+
+        rollup.transformations += totals[0]
+        rollup.prompt_tokens += totals[1]
+        rollup.completion_tokens += totals[2]
+        rollup.latency_ms_total += totals[3]
+        rollup.latency_samples += totals[4]
+        rollup.time_to_first_token_ms_total += totals[5]
+        rollup.time_to_first_token_samples += totals[6]
+
+def _hot_totals(key, user_id):
+    query = db.session.query(
+        key,
+        func.count(Transformation.id),
+        func.sum(Transformation.prompt_tokens),
+        func.sum(Transformation.completion_tokens),
+        func.sum(Transformation.latency_ms),
+        func.count(Transformation.latency_ms),
+        func.sum(Transformation.time_to_first_token_ms),
+        func.count(Transformation.time_to_first_token_ms)
+    ).join(User, Transformation.user_id == User.id)
+    if user_id is not None:
+        query = query.filter(Transformation.user_id == user_id)
+    return query.group_by(key).all()
+
+def _archived_totals(key, user_id):
+    query = db.session.query(
+        key,
+        func.sum(UsageRollup.transformations),
+        func.sum(UsageRollup.prompt_tokens),
+        func.sum(UsageRollup.completion_tokens),
+        func.sum(UsageRollup.latency_ms_total),
+        func.sum(UsageRollup.latency_samples),
+        func.sum(UsageRollup.time_to_first_token_ms_total),
+        func.sum(UsageRollup.time_to_first_token_samples)
+    ).join(User, UsageRollup.user_id == User.id)
+    if user_id is not None:
+        query = query.filter(UsageRollup.user_id == user_id)
+    return query.group_by(key).all()
+
+def aggregate_usage(group_by, user_id=None):
+    """
+    Summarise token usage and latency of stored transformations, including
+    those already moved to cold storage.
+
+    Args:
+        group_by (str): One of the keys of USAGE_GROUPS, or of
+            USER_USAGE_GROUPS when user_id is given
+        user_id (int): Restrict the summary to one user's transformations
+
+    Returns:
+        list: One dict per group with request count, token totals and
+            average latency figures
+    """
+    allowed = USAGE_GROUPS if user_id is None else USER_USAGE_GROUPS
+    if group_by not in allowed:
+        raise ValueError(f"Invalid group_by: {group_by}")
+
+    column = USAGE_GROUPS[group_by]
+    hot_key = getattr(Transformation, column) if column else User.username
+    archived_key = getattr(UsageRollup, column) if column else User.username
+    if column == 'model_name':
+        # Unknown models are '' in the rollup but NULL in the hot table
+        archived_key = func.nullif(archived_key, '')
+
+    totals = {}
+    for row in _hot_totals(hot_key, user_id) + _archived_totals(archived_key, user_id):
+        group = totals.setdefault(row[0], [0] * 7)
+        for i, value in enumerate(row[1:]):
+            group[i] += int(value or 0)
+
+    results = []
+    for key_value, (count, prompt_tokens, completion_tokens,
+                    latency_total, latency_samples, ttft_total, ttft_samples) in totals.items():
+        results.append({
+            group_by: key_value,
+            'transformations': count,
+            'prompt_tokens': prompt_tokens,
+            'completion_tokens': completion_tokens,
+            'avg_latency_ms': round(latency_total / latency_samples, 1) if latency_samples else None,
+            'avg_time_to_first_token_ms': round(ttft_total / ttft_samples, 1) if ttft_samples else None
+        })
+    return sorted(results, key=lambda r: r['transformations'], reverse=True)